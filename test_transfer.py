@@ -0,0 +1,117 @@
+# test_transfer.py — round-trip экспорт → импорт в чистую БД через transfer.py
+import io, os, json, tempfile
+
+# database.py открывает БД при импорте — всегда во временном каталоге, не в ./data и не в DB_PATH разработчика
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(), "kukkido.db")
+
+import pytest
+import database
+import transfer
+
+
+@pytest.fixture
+def use_db(tmp_path):
+    """Переключает database.py на новый файл БД в tmp_path; исходное подключение не трогает."""
+    orig_path, orig_conn = database.DB_PATH, database._CONN
+
+    def close_own() -> None:
+        if database._CONN is not None and database._CONN is not orig_conn:
+            database._CONN.close()
+
+    def switch(name: str) -> None:
+        close_own()
+        database.DB_PATH = str(tmp_path / name)
+        database._CONN = None
+        database._init_db()
+
+    yield switch
+    close_own()
+    database.DB_PATH, database._CONN = orig_path, orig_conn
+
+
+def _dump_tables():
+    conn = database._get_conn()
+    return {
+        "profiles": [tuple(r) for r in conn.execute("SELECT * FROM profiles ORDER BY user_id")],
+        "templates": [tuple(r) for r in conn.execute("SELECT * FROM templates ORDER BY user_id, name")],
+        "history": [tuple(r) for r in conn.execute("SELECT user_id, timestamp, type, data FROM history ORDER BY id")],
+    }
+
+
+def test_round_trip(use_db):
+    use_db("src.db")
+    database.get_or_create_profile(1)
+    database.update_profile(1, {"role": "athlete", "age": 17, "height": 170, "weight": 63.5,
+                                "notes": {"пояс": "красный"}})
+    database.get_or_create_profile(2)
+    database.save_template(1, "спарринг", "план", {"minutes": 90})
+    database.add_log_entry(1, {"type": "plan", "level": "pro"})
+    # JSON-строка как значение — должна пережить round-trip без изменений
+    conn = database._get_conn()
+    conn.execute("INSERT INTO history (user_id, timestamp, type, data) VALUES ('2', NULL, 'note', ?)",
+                 (json.dumps("x"),))
+    # NULL-колонки, не-JSON текст и текст 'null' должны вернуться без изменений
+    conn.execute("INSERT INTO profiles VALUES ('9', 'athlete', NULL, NULL, NULL, NULL)")
+    conn.execute("INSERT INTO history (user_id, timestamp, type, data) VALUES ('9', NULL, NULL, 'notjson')")
+    conn.execute("INSERT INTO templates VALUES ('9', 't', NULL, 'null', NULL)")
+    conn.commit()
+    before = _dump_tables()
+
+    out = io.StringIO()
+    assert transfer.export_jsonl(out) == 8
+
+    use_db("dst.db")
+    stats = transfer.import_records(transfer.iter_jsonl(io.StringIO(out.getvalue())), strict=True)
+    assert stats == {"profile": 3, "template": 2, "history": 3, "skipped": 0}
+    assert _dump_tables() == before
+    assert database.get_or_create_profile(1)["notes"] == {"пояс": "красный"}
+    assert [log["data"] for log in database.get_logs(9, 10)] == [{}]
+
+
+def test_import_applies_defaults_only_for_missing_fields(use_db):
+    use_db("dst.db")
+    lines = [
+        json.dumps({"kind": "profile", "user_id": 1}),
+        json.dumps({"kind": "profile", "user_id": 2, "age": None, "notes": None}),
+    ]
+    transfer.import_records(transfer.iter_jsonl(io.StringIO("\n".join(lines))), strict=True)
+    assert _dump_tables()["profiles"] == [
+        ("1", "coach", 0, 0, 0.0, "{}"),
+        ("2", "coach", None, 0, 0.0, None),
+    ]
+
+
+def test_import_skips_bad_rows(use_db):
+    use_db("dst.db")
+    lines = [
+        "not json",
+        json.dumps({"kind": "profile", "user_id": "2", "age": {"x": 1}}),
+        json.dumps({"kind": "unknown", "user_id": "2"}),
+        json.dumps({"kind": "profile", "user_id": "3", "notes": "hello"}),
+        json.dumps({"kind": "profile", "user_id": 1.0}),
+        json.dumps({"kind": "profile", "user_id": True}),
+        json.dumps({"kind": "history", "user_id": {"a": 1}}),
+    ]
+    stats = transfer.import_records(transfer.iter_jsonl(io.StringIO("\n".join(lines))))
+    assert stats["profile"] == 1 and stats["history"] == 0 and stats["skipped"] == 6
+    assert database.get_or_create_profile(3)["notes"] == "hello"
+
+
+def test_import_skips_unbindable_rows(use_db):
+    use_db("dst.db")
+    lines = [
+        json.dumps({"kind": "profile", "user_id": "1", "age": 10 ** 30}),
+        json.dumps({"kind": "profile", "user_id": "2", "role": "\ud800"}),
+        json.dumps({"kind": "history", "user_id": "2", "data": {"x": "\ud800"}}),
+        json.dumps({"kind": "profile", "user_id": "3", "age": 12}),
+        json.dumps({"kind": "history", "user_id": "3", "data": {"x": 1}}),
+    ]
+    stats = transfer.import_records(transfer.iter_jsonl(io.StringIO("\n".join(lines))))
+    assert stats == {"profile": 1, "template": 0, "history": 1, "skipped": 3}
+    assert database.get_or_create_profile(3)["age"] == 12
+
+
+def test_legacy_rejects_non_object_entry(use_db):
+    use_db("dst.db")
+    with pytest.raises(ValueError, match="'1'"):
+        transfer.import_records(transfer.iter_legacy_profiles(io.StringIO('{"1": [1, 2]}')), strict=True)
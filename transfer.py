@@ -0,0 +1,299 @@
+# transfer.py — потоковый импорт/экспорт профилей, шаблонов и истории (JSON Lines)
+#
+# Формат: одна JSON-запись на строку, поле "kind" определяет таблицу:
+#   {"kind": "profile",  "user_id": "...", "role": ..., "age": ..., "height": ..., "weight": ..., "notes": {...}}
+#   {"kind": "template", "user_id": "...", "name": ..., "plan": ..., "params": {...}, "created": ...}
+#   {"kind": "history",  "user_id": "...", "timestamp": ..., "type": ..., "data": {...}}
+#
+# null в файле — это NULL в БД; значения по умолчанию подставляются только для
+# отсутствующих полей. Если в JSON-колонке (notes/params/data) лежит не JSON,
+# он выгружается как есть в поле "<колонка>_raw" и так же возвращается при импорте.
+#
+# Примеры:
+#   python transfer.py export backup.jsonl
+#   python transfer.py export - --kinds profile template > backup.jsonl
+#   python transfer.py import backup.jsonl
+#   python transfer.py import-legacy profiles.json
+#
+# Путь к базе берётся из DB_PATH / DATA_DIR, как и в database.py.
+from __future__ import annotations
+import sys, json, argparse
+from typing import Dict, Any, List, Iterator, Iterable, TextIO, Tuple
+
+from database import _get_conn, _LOCK
+
+KINDS = ("profile", "template", "history")
+
+# Сколько строк накапливаем перед executemany и сколько — перед COMMIT
+BATCH_SIZE = 5_000
+COMMIT_EVERY = 200_000
+
+# Колонки каждой таблицы в порядке вставки; JSON-поля хранятся в БД строкой
+_TABLES: Dict[str, Tuple[str, Tuple[str, ...], Tuple[str, ...], bool]] = {
+    # kind: (таблица, колонки, JSON-колонки, INSERT OR REPLACE по первичному ключу)
+    "profile": ("profiles", ("user_id", "role", "age", "height", "weight", "notes"), ("notes",), True),
+    "template": ("templates", ("user_id", "name", "plan", "params", "created"), ("params",), True),
+    # id не переносим: при импорте история дописывается с новыми id
+    "history": ("history", ("user_id", "timestamp", "type", "data"), ("data",), False),
+}
+
+_INSERT_SQL = {
+    kind: (f"INSERT {'OR REPLACE ' if replace else ''}INTO {table} ({', '.join(columns)}) "
+           f"VALUES ({', '.join('?' * len(columns))})")
+    for kind, (table, columns, _, replace) in _TABLES.items()
+}
+
+# Значения по умолчанию — те же, что в get_or_create_profile
+_DEFAULTS = {
+    "profile": {"role": "coach", "age": 0, "height": 0, "weight": 0.0, "notes": {}},
+    "template": {"plan": "", "params": {}, "created": None},
+    "history": {"timestamp": None, "type": "unknown", "data": {}},
+}
+
+# Прагмы для массовой загрузки; прежние значения запоминаются и возвращаются после неё
+_BULK_PRAGMAS = {
+    "journal_mode": "MEMORY",
+    "synchronous": "OFF",
+    "temp_store": "MEMORY",
+    "cache_size": "-262144",  # ~256 МБ
+}
+
+
+# ---- Экспорт ----
+def _decode_json(value: Any) -> Tuple[bool, Any]:
+    """(True, значение) для корректного JSON, (False, None) — если его нужно выгрузить как _raw."""
+    try:
+        decoded = json.loads(value)
+    except (TypeError, ValueError):
+        return False, None
+    # Текст 'null' иначе не отличить от NULL в БД
+    return decoded is not None, decoded
+
+
+def iter_records(kinds: Iterable[str] = KINDS) -> Iterator[Dict[str, Any]]:
+    """Построчно отдаёт записи из БД, не загружая таблицы в память целиком."""
+    conn = _get_conn()
+    for kind in kinds:
+        table, columns, json_columns, _ = _TABLES[kind]
+        cursor = conn.execute(f"SELECT {', '.join(columns)} FROM {table}")
+        while True:
+            rows = cursor.fetchmany(BATCH_SIZE)
+            if not rows:
+                break
+            for row in rows:
+                record = {"kind": kind}
+                record.update(zip(columns, row))
+                for col in json_columns:
+                    if record[col] is None:
+                        continue
+                    ok, decoded = _decode_json(record[col])
+                    if ok:
+                        record[col] = decoded
+                    else:
+                        record[f"{col}_raw"] = record.pop(col)
+                yield record
+
+
+def export_jsonl(out: TextIO, kinds: Iterable[str] = KINDS) -> int:
+    count = 0
+    with _LOCK:
+        for record in iter_records(kinds):
+            out.write(json.dumps(record, ensure_ascii=False))
+            out.write("\n")
+            count += 1
+    return count
+
+
+# ---- Импорт ----
+# Типы, которые можно записать в обычную (не JSON) колонку; bool — подкласс int
+_SCALAR_TYPES = (str, int, float, type(None))
+# INTEGER в SQLite — знаковое 64-битное
+_INT_MIN, _INT_MAX = -2 ** 63, 2 ** 63 - 1
+
+
+def _check_bindable(col: str, value: Any) -> None:
+    """Отсекает то, на чём sqlite упадёт в executemany и оборвёт весь импорт."""
+    if not isinstance(value, _SCALAR_TYPES):
+        raise ValueError(f"поле {col} должно быть строкой или числом, а не {type(value).__name__}")
+    if isinstance(value, int) and not _INT_MIN <= value <= _INT_MAX:
+        raise ValueError(f"поле {col}: число вне диапазона INTEGER")
+    if isinstance(value, str):
+        try:
+            value.encode("utf-8")
+        except UnicodeEncodeError as e:
+            raise ValueError(f"поле {col}: строка не кодируется в UTF-8") from e
+
+
+def _to_row(record: Dict[str, Any] | str) -> Tuple[str, Tuple[Any, ...]]:
+    if isinstance(record, str):
+        record = json.loads(record)  # JSONDecodeError — подкласс ValueError
+    if not isinstance(record, dict):
+        raise ValueError("запись должна быть JSON-объектом")
+    kind = record.get("kind")
+    if kind not in _TABLES:
+        raise ValueError(f"неизвестный kind: {kind!r}")
+    user_id = record.get("user_id")
+    if user_id is None:
+        raise ValueError("нет user_id")
+    # Telegram id — строка или целое; 1.0, true или объект не совпадут ни с одним пользователем
+    if isinstance(user_id, bool) or not isinstance(user_id, (str, int)):
+        raise ValueError(f"user_id должен быть строкой или целым числом, а не {type(user_id).__name__}")
+    if kind == "template" and not record.get("name"):
+        raise ValueError("у шаблона нет name")
+
+    _, columns, json_columns, _ = _TABLES[kind]
+    defaults = _DEFAULTS[kind]
+    row = []
+    for col in columns:
+        if col in json_columns and f"{col}_raw" in record:
+            # Не-JSON текст из экспорта — пишем как был
+            value = record[f"{col}_raw"]
+            if not isinstance(value, str):
+                raise ValueError(f"поле {col}_raw должно быть строкой")
+        elif col in record or col not in defaults:
+            value = record.get(col)
+            if col == "user_id":
+                value = str(value)
+            elif col in json_columns and value is not None:
+                # В файле лежит JSON-значение (экспорт его раскодирует), в БД — его JSON-строка
+                value = json.dumps(value, ensure_ascii=False)
+        else:
+            value = defaults[col]
+            if col in json_columns and value is not None:
+                value = json.dumps(value, ensure_ascii=False)
+        _check_bindable(col, value)
+        row.append(value)
+    return kind, tuple(row)
+
+
+def iter_jsonl(src: TextIO) -> Iterator[Tuple[int, str]]:
+    # Разбор JSON делает _to_row, чтобы битая строка не обрывала весь импорт
+    for lineno, line in enumerate(src, 1):
+        line = line.strip()
+        if line:
+            yield lineno, line
+
+
+def import_records(records: Iterable[Tuple[int, Dict[str, Any] | str]], strict: bool = False) -> Dict[str, int]:
+    """
+    Пишет записи пачками через executemany. Память ограничена размером пачки,
+    COMMIT выполняется раз в COMMIT_EVERY строк. Битые записи пропускаются
+    (или прерывают импорт при strict=True).
+    """
+    stats = {kind: 0 for kind in KINDS}
+    stats["skipped"] = 0
+    batches: Dict[str, List[Tuple[Any, ...]]] = {kind: [] for kind in KINDS}
+
+    with _LOCK:
+        conn = _get_conn()
+        conn.commit()  # прагму journal_mode нельзя менять внутри транзакции
+        saved = {name: conn.execute(f"PRAGMA {name}").fetchone()[0] for name in _BULK_PRAGMAS}
+
+        def flush(kind: str) -> None:
+            if batches[kind]:
+                conn.executemany(_INSERT_SQL[kind], batches[kind])
+                stats[kind] += len(batches[kind])
+                batches[kind].clear()
+
+        try:
+            # Внутри try: если прагма упадёт на полпути (например, BUSY), finally вернёт уже применённые
+            for name, value in _BULK_PRAGMAS.items():
+                conn.execute(f"PRAGMA {name} = {value}")
+            pending = 0
+            for lineno, record in records:
+                try:
+                    kind, row = _to_row(record)
+                except ValueError as e:
+                    if strict:
+                        raise ValueError(f"строка {lineno}: {e}") from e
+                    print(f"[WARN] строка {lineno} пропущена: {e}", file=sys.stderr)
+                    stats["skipped"] += 1
+                    continue
+
+                batches[kind].append(row)
+                if len(batches[kind]) >= BATCH_SIZE:
+                    flush(kind)
+                pending += 1
+                if pending >= COMMIT_EVERY:
+                    for k in KINDS:
+                        flush(k)
+                    conn.commit()
+                    pending = 0
+
+            for k in KINDS:
+                flush(k)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            for name, value in saved.items():
+                conn.execute(f"PRAGMA {name} = {value}")
+
+    return stats
+
+
+def iter_legacy_profiles(src: TextIO) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    # Старый profiles.json — один объект {user_id: профиль}, читаем его целиком
+    data = json.load(src)
+    if not isinstance(data, dict):
+        raise ValueError("profiles.json должен быть объектом {user_id: профиль}")
+    for i, (uid, profile) in enumerate(data.items(), 1):
+        if not isinstance(profile, dict):
+            raise ValueError(f"профиль {uid!r} должен быть JSON-объектом")
+        record = dict(profile, kind="profile", user_id=uid)
+        yield i, record
+
+
+# ---- CLI ----
+def _open(path: str, mode: str) -> TextIO:
+    if path == "-":
+        return sys.stdout if "w" in mode else sys.stdin
+    return open(path, mode, encoding="utf-8")
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Импорт/экспорт данных KukkiDo в формате JSON Lines")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_export = sub.add_parser("export", help="выгрузить БД в JSONL")
+    p_export.add_argument("path", help="файл для записи или '-' для stdout")
+    p_export.add_argument("--kinds", nargs="+", choices=KINDS, default=list(KINDS))
+
+    p_import = sub.add_parser("import", help="загрузить JSONL в БД")
+    p_import.add_argument("path", help="файл для чтения или '-' для stdin")
+    p_import.add_argument("--strict", action="store_true", help="прерывать импорт на первой битой записи")
+
+    p_legacy = sub.add_parser("import-legacy", help="перенести старый profiles.json в БД")
+    p_legacy.add_argument("path", nargs="?", default="profiles.json")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        f = _open(args.path, "w")
+        try:
+            count = export_jsonl(f, args.kinds)
+        finally:
+            if f is not sys.stdout:
+                f.close()
+        print(f"Экспортировано записей: {count}", file=sys.stderr)
+        return 0
+
+    f = _open(args.path, "r")
+    try:
+        if args.command == "import":
+            stats = import_records(iter_jsonl(f), strict=args.strict)
+        else:
+            stats = import_records(iter_legacy_profiles(f), strict=True)
+    except ValueError as e:
+        print(f"[ERROR] Импорт прерван: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if f is not sys.stdin:
+            f.close()
+    print("Импортировано: " + ", ".join(f"{k}={v}" for k, v in stats.items()), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())